@@ -1,39 +1,111 @@
 import dash
-from dash import dcc, html, Input, Output, State
-import plotly.express as px
+from dash import dcc, html, ctx, CeleryManager, Input, Output, State
+from celery import Celery
+import flask
+from flask import request
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
+import polars as pl
+import functools
 import os
 
+from data import get_merged, get_health, get_survey
+
 # Initialize Dash app
-app = dash.Dash(__name__)
+# compress=True gzips layout and callback responses (the choropleth JSON is the largest payload).
+# Dash wants gzip only, as Brotli is slow on dynamic responses, but recent flask-compress
+# reads the algorithm list at init, so it has to be set before Dash sets up compression.
+flask_server = flask.Flask(__name__)
+flask_server.config["COMPRESS_ALGORITHM"] = ["gzip"]
+app = dash.Dash(__name__, server=flask_server, compress=True)
 server = app.server  # This is needed for Render deployment
 
-# Use relative file paths
-current_dir = os.path.dirname(os.path.abspath(__file__))
-merged_df = pd.read_csv(os.path.join(current_dir, "merged_dashboard_data.csv"))
-health_df = pd.read_csv(os.path.join(current_dir, "world_health_indicators.csv"))
+# Background mode is opt-in: set CELERY_BROKER_URL (e.g. redis://localhost:6379/0) to run
+# the dashboard callback on a Celery worker. A worker must be running
+# (celery -A app.celery_app worker), otherwise jobs never finish and the dashboard stops updating.
+celery_broker_url = os.environ.get("CELERY_BROKER_URL")
+if celery_broker_url:
+    celery_app = Celery(__name__, broker=celery_broker_url, backend=celery_broker_url)
+    background_callback_manager = CeleryManager(celery_app)
+else:
+    background_callback_manager = None
 
-# Load mental health survey data
-occ_data_full = pd.read_csv(os.path.join(current_dir, "mental_health_survey_2020.csv"))
-occ_data_full["Timestamp"] = pd.to_datetime(occ_data_full["Timestamp"])
-occ_data_full["year"] = occ_data_full["Timestamp"].dt.year
+# Let browsers keep the static pictograph images instead of refetching them
+assets_path_prefix = app.config.routes_pathname_prefix + app.config.assets_url_path.strip("/") + "/"
 
-# Choropleth Map
-map_fig = px.choropleth(
-    merged_df,
-    locations="country_code",
-    color="pct_treatment",
-    hover_name="country",
-    custom_data=["life_expect", "pct_treatment"],
-    color_continuous_scale=[[0, '#99ccff'], [0.5, '#3366cc'], [1.0, '#003366']],
-    projection="natural earth",
-    title="Global Mental Health Treatment Rates"
+@server.after_request
+def cache_static_assets(response):
+    if request.path.startswith(assets_path_prefix):
+        response.headers["Cache-Control"] = "public, max-age=86400"
+    return response
+
+# Load dashboard data through the shared loaders
+merged_df = get_merged()
+health_df = get_health()
+survey = get_survey()
+# Only the occupation counting below needs pandas, so convert just its columns
+occ_data = survey.select("Country", "Occupation", "history_yes").to_pandas(use_pyarrow_extension_array=True)
+occ_data[["Country", "Occupation"]] = occ_data[["Country", "Occupation"]].astype("category")
+
+# Canonical, sorted list of countries shown on the dashboard
+COUNTRIES = tuple(sorted(merged_df["country"].dropna().unique().tolist()))
+
+# Per-country lookups so callbacks don't rescan the full frames on every click
+HEALTH_BY_COUNTRY = dict(tuple(health_df.groupby("country", sort=False, observed=True)))
+
+# Survey aggregates never change, so reduce them once per country
+COUNTRY_STATS = (
+    survey.group_by("Country")
+    .agg(pl.col("coping_yes").mean() * 100, pl.col("history_yes").mean() * 100)
+    .rows_by_key("Country", named=True, unique=True)
 )
+
+# Count occupations per country among respondents with a mental health history
+# with one bincount over combined (country, occupation) codes
+country_codes, survey_countries = pd.factorize(occ_data["Country"])
+occ_codes, occupations = pd.factorize(occ_data["Occupation"])
+n_countries, n_occs = len(survey_countries), len(occupations)
+history_mask = occ_data["history_yes"].to_numpy(dtype=bool) & (country_codes >= 0) & (occ_codes >= 0)
+pair_codes = country_codes[history_mask] * n_occs + occ_codes[history_mask]
+occ_counts = np.bincount(pair_codes, minlength=n_countries * n_occs).reshape(n_countries, n_occs)
+
+# First row each pair appears in, so ties keep value_counts' order
+occ_first_seen = np.full(n_countries * n_occs, -1, np.int64)
+seen_pairs, first_rows = np.unique(pair_codes, return_index=True)
+occ_first_seen[seen_pairs] = first_rows
+occ_first_seen = occ_first_seen.reshape(n_countries, n_occs)
+
+# Turn the whole count matrix into percentages in one numpy pass, then keep each
+# country's (occupations, percentages) in value_counts order, ready for the bar chart
+occ_totals = occ_counts.sum(axis=1)
+with np.errstate(divide="ignore", invalid="ignore"):
+    occ_pct = occ_counts / occ_totals[:, None] * 100
+occupation_names = np.asarray(occupations, dtype=object)
+
+OCC_SHARE = {}
+for i, c in enumerate(survey_countries):
+    if occ_totals[i] == 0:
+        continue
+    seen = np.flatnonzero(occ_counts[i])
+    order = seen[np.lexsort((occ_first_seen[i, seen], -occ_counts[i, seen]))]
+    OCC_SHARE[c] = (occupation_names[order].tolist(), occ_pct[i, order])
+
+# Choropleth Map
+map_fig = go.Figure(go.Choropleth(
+    locations=merged_df["country_code"].to_numpy(),
+    z=merged_df["pct_treatment"].to_numpy(),
+    hovertext=merged_df["country"].to_numpy(),
+    customdata=np.stack([merged_df["life_expect"].to_numpy(), merged_df["pct_treatment"].to_numpy()], axis=1),
+    coloraxis="coloraxis"
+))
 map_fig.update_layout(
     margin={"r": 0, "t": 50, "l": 0, "b": 0},
     paper_bgcolor="rgba(0,0,0,0)",
     font_color="white",
+    title="Global Mental Health Treatment Rates",
+    geo=dict(projection_type="natural earth"),
+    coloraxis_colorscale=[[0, '#99ccff'], [0.5, '#3366cc'], [1.0, '#003366']],
     coloraxis_colorbar=dict(
         title="Rate (%)",
         len=0.8,
@@ -51,12 +123,14 @@ map_fig.update_traces(
                   "Life Expectancy: %{customdata[0]:.1f} years<br><extra></extra>"
 )
 
+# The ten icons for a given image never change, so build them once per image
+@functools.lru_cache(maxsize=None)
+def _pictograph_icons(img_src):
+    return tuple(html.Img(src=img_src, style={"height": "65px", "margin": "0 5px"}) for _ in range(10))
+
 # Generate pictograph using actual silhouette images
 def render_image_pictograph(count, filled_src, unfilled_src, label_text, percentage, country):
-    icons = []
-    for i in range(10):
-        img_src = filled_src if i < count else unfilled_src
-        icons.append(html.Img(src=img_src, style={"height": "65px", "margin": "0 5px"}))
+    icons = list(_pictograph_icons(filled_src)[:count]) + list(_pictograph_icons(unfilled_src)[count:])
     return html.Div([
         html.Div([
             html.Div(label_text, style={"textAlign": "center", "color": "white", "fontFamily": "Arial", "fontSize": "16px"}),
@@ -65,8 +139,44 @@ def render_image_pictograph(count, filled_src, unfilled_src, label_text, percent
         html.Div(icons, style={"display": "flex", "justifyContent": "center"})
     ], style={"backgroundColor": "#1976d2", "borderRadius": "10px", "padding": "20px 15px", "width": "100%", "boxSizing": "border-box"}, key=f"{label_text}-{count}")
 
+def _build_pictographs(country):
+    stats = COUNTRY_STATS.get(country)
+
+    if stats is not None:
+        coping_pct = stats["coping_yes"]
+        history_pct = stats["history_yes"]
+        coping_rate = round(coping_pct / 10)
+        history_rate = round(history_pct / 10)
+    else:
+        coping_rate = 5
+        history_rate = 5
+        coping_pct = 50.0
+        history_pct = 50.0
+
+    coping_pic = render_image_pictograph(
+        coping_rate,
+        "/assets/red.png",
+        "/assets/white.png",
+        f"{coping_rate} out of 10 People in {country} Struggle with Coping as of 2020",
+        coping_pct,
+        country
+    )
+
+    history_pic = render_image_pictograph(
+        history_rate,
+        "/assets/red.png",
+        "/assets/white.png",
+        f"{history_rate} out of 10 People in {country} had a previous history of mental health disorders as of 2020",
+        history_pct,
+        country
+    )
+    return coping_pic, history_pic
+
+# Survey stats are fixed, so build each dashboard country's pictographs once at startup
+PICTOGRAPHS = {c: _build_pictographs(c) for c in COUNTRIES}
+
 # Dropdown options
-country_options = [{'label': c, 'value': c} for c in sorted(merged_df['country'].unique())]
+country_options = [{'label': c, 'value': c} for c in COUNTRIES]
 
 # Layout
 app.layout = html.Div([
@@ -97,64 +207,46 @@ app.layout = html.Div([
 
 ], style={"background": "linear-gradient(to bottom right, #144579, #0a1e3f)"})
 
-# Callback
-@app.callback(
-    [Output("line-chart", "figure"),
-     Output("histogram", "figure"),
-     Output("coping-pictograph", "children"),
-     Output("history-pictograph", "children"),
-     Output("country-dropdown", "value")],
-    [Input("choropleth-map", "clickData"),
-     Input("country-dropdown", "value")]
-)
-def update_dashboard(click_data, dropdown_value):
-    ctx = dash.callback_context
-    country = "United States"
-
-    if ctx.triggered and ctx.triggered[0]["prop_id"].startswith("choropleth-map") and click_data:
-        country = click_data["points"][0]["hovertext"]
-    elif dropdown_value:
-        country = dropdown_value
-
-    # Line chart
-    filtered_exp = health_df[health_df["country"] == country]
-    line_fig = px.line(
-        filtered_exp,
-        x="year", y="health_exp", markers=True,
-        title=f"Healthcare Expenditure Trend for {country}",
-        labels={"year": "Year", "health_exp": "Expenditure (% of GDP)"},
-        color_discrete_sequence=["#3daff5"]
-    )
+# Figures only depend on the selected country, so cache them per country.
+# The builders return the figure's plain JSON dict, which Dash can send back
+# as-is without re-walking the Figure object on every cache hit.
+@functools.lru_cache(maxsize=512)
+def _build_line_fig(country):
+    filtered_exp = HEALTH_BY_COUNTRY.get(country, health_df.iloc[0:0])
+    line_fig = go.Figure(go.Scatter(
+        x=filtered_exp["year"].to_numpy(), y=filtered_exp["health_exp"].to_numpy(),
+        mode="lines+markers",
+        line=dict(color="#3daff5"),
+        hovertemplate="Year=%{x}<br>Expenditure (% of GDP)=%{y}<extra></extra>"
+    ))
     line_fig.update_layout(
+        title=f"Healthcare Expenditure Trend for {country}",
+        xaxis_title="Year", yaxis_title="Expenditure (% of GDP)",
         paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)",
         font_color="white",
         margin={"t": 50, "b": 30}, height=220,
         yaxis=dict(title_font=dict(size=11))
     )
+    return line_fig.to_plotly_json()
 
-    # Histogram
-    occ_data = occ_data_full[
-        (occ_data_full["Country"] == country) &
-        (occ_data_full["Mental_Health_History"].str.strip().str.lower() == "yes") 
-    ]
+@functools.lru_cache(maxsize=512)
+def _build_hist_fig(country):
+    occ_share = OCC_SHARE.get(country)
 
-    if not occ_data.empty:
-        occ_counts = occ_data["Occupation"].value_counts(normalize=True).mul(100).reset_index()
-        occ_counts.columns = ["Occupation", "Percentage"]
+    if occ_share is not None:
+        occupations, percentages = occ_share
     else:
-        occ_counts = pd.DataFrame({
-            "Occupation": ["Housewife", "Student", "Business", "Corporate", "Others"],
-            "Percentage": [0, 0, 0, 0, 0]
-        })
+        occupations = ["Housewife", "Student", "Business", "Corporate", "Others"]
+        percentages = [0, 0, 0, 0, 0]
 
-    hist_fig = px.bar(
-        occ_counts, x="Occupation", y="Percentage",
-        title=f"Distribution of Occupations with Mental Health Disorder History in {country} (2020)",
-        labels={"Occupation": "Occupation Group", "Percentage": "Population Share"},
-        color="Occupation",
-        color_discrete_sequence=["#144579", "#4ba2db", "#41c6c6", "#cce5f6", "#f3f3f3"]
-    )
+    hist_fig = go.Figure(go.Bar(
+        x=occupations, y=percentages,
+        marker_color=["#144579", "#4ba2db", "#41c6c6", "#cce5f6", "#f3f3f3"][:len(occupations)],
+        hovertemplate="Occupation Group=%{x}<br>Population Share=%{y}<extra></extra>"
+    ))
     hist_fig.update_layout(
+        title=f"Distribution of Occupations with Mental Health Disorder History in {country} (2020)",
+        xaxis_title="Occupation Group", yaxis_title="Population Share",
         paper_bgcolor="rgba(0,0,0,0)",
         plot_bgcolor="rgba(0,0,0,0)",
         font=dict(color="white", size=11),  
@@ -162,42 +254,45 @@ def update_dashboard(click_data, dropdown_value):
         height=220,
         showlegend=False
     )
+    return hist_fig.to_plotly_json()
 
-    # Pictographs
-    filtered_survey = occ_data_full[(occ_data_full["Country"] == country)]
+# Everything the callback returns is a pure function of the country and is
+# served from the in-process caches above
+def _compute_dashboard(country):
+    line_fig = _build_line_fig(country)
+    hist_fig = _build_hist_fig(country)
 
-    if not filtered_survey.empty:
-        coping_yes = (filtered_survey["Coping_Struggles"].str.strip().str.lower() == "yes")
-        history_yes = (filtered_survey["Mental_Health_History"].str.strip().str.lower() == "yes")
-        coping_pct = coping_yes.mean() * 100
-        history_pct = history_yes.mean() * 100
-        coping_rate = round(coping_pct / 10)
-        history_rate = round(history_pct / 10)
+    # Pictographs
+    if country in PICTOGRAPHS:
+        coping_pic, history_pic = PICTOGRAPHS[country]
     else:
-        coping_rate = 5
-        history_rate = 5
-        coping_pct = 50.0
-        history_pct = 50.0
+        coping_pic, history_pic = _build_pictographs(country)
 
-    coping_pic = render_image_pictograph(
-        coping_rate,
-        "/assets/red.png",
-        "/assets/white.png",
-        f"{coping_rate} out of 10 People in {country} Struggle with Coping as of 2020",
-        coping_pct,
-        country
-    )
+    return line_fig, hist_fig, coping_pic, history_pic, country
 
-    history_pic = render_image_pictograph(
-        history_rate,
-        "/assets/red.png",
-        "/assets/white.png",
-        f"{history_rate} out of 10 People in {country} had a previous history of mental health disorders as of 2020",
-        history_pct,
-        country
-    )
+# Callback
+@app.callback(
+    [Output("line-chart", "figure"),
+     Output("histogram", "figure"),
+     Output("coping-pictograph", "children"),
+     Output("history-pictograph", "children"),
+     Output("country-dropdown", "value")],
+    [Input("choropleth-map", "clickData"),
+     Input("country-dropdown", "value")],
+    background=background_callback_manager is not None,
+    manager=background_callback_manager,
+    # Background mode only: poll for the result quickly, since warm jobs finish in microseconds,
+    # and disable the dropdown while a job is running
+    interval=100,
+    running=[(Output("country-dropdown", "disabled"), True, False)]
+)
+def update_dashboard(click_data, dropdown_value):
+    if ctx.triggered_id == "choropleth-map" and click_data:
+        country = click_data["points"][0]["hovertext"]
+    else:
+        country = dropdown_value or "United States"
 
-    return line_fig, hist_fig, coping_pic, history_pic, country
+    return _compute_dashboard(country)
 
 if __name__ == '__main__':
     # Use PORT environment variable if it exists (for Render compatibility)
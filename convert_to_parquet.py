@@ -0,0 +1,25 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os
+
+# One-time offline conversion of the dashboard CSVs to Parquet.
+# Run this whenever a source CSV changes: python convert_to_parquet.py
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+DATASETS = [
+    "merged_dashboard_data",
+    "world_health_indicators",
+    "mental_health_survey_2020",
+]
+
+for name in DATASETS:
+    df = pd.read_csv(os.path.join(current_dir, f"{name}.csv"))
+
+    # Parse timestamps here so the app reads them back already typed
+    if "Timestamp" in df.columns:
+        df["Timestamp"] = pd.to_datetime(df["Timestamp"], format="%Y-%m-%d %H:%M:%S", cache=True)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, os.path.join(current_dir, f"{name}.parquet"), compression="snappy")
+    print(f"Wrote {name}.parquet ({len(df)} rows)")
@@ -0,0 +1,43 @@
+import pandas as pd
+import polars as pl
+import functools
+import os
+
+# Shared data loaders. Each file is read once per process, however many apps
+# import it; callers must treat the returned frames as read-only.
+# The Parquet files are generated by convert_to_parquet.py.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+@functools.lru_cache(maxsize=1)
+def get_merged():
+    merged_df = pd.read_parquet(os.path.join(current_dir, "merged_dashboard_data.parquet"), engine="pyarrow")
+    merged_df["year"] = merged_df["year"].astype("int16")
+    # Country names are only ever compared and grouped on, so store them as categoricals
+    merged_df["country"] = merged_df["country"].astype("category")
+    return merged_df
+
+@functools.lru_cache(maxsize=1)
+def get_health():
+    health_df = pd.read_parquet(
+        os.path.join(current_dir, "world_health_indicators.parquet"),
+        engine="pyarrow",
+        columns=["country", "year", "health_exp"]
+    )
+    health_df["year"] = health_df["year"].astype("int16")
+    health_df["country"] = health_df["country"].astype("category")
+    return health_df
+
+# Mental health survey as a Polars frame, with yes/no answers normalized once.
+# Only the year of each response is used, so the full Timestamp is dropped.
+@functools.lru_cache(maxsize=1)
+def get_survey():
+    return (
+        pl.scan_parquet(os.path.join(current_dir, "mental_health_survey_2020.parquet"))
+        .with_columns(
+            coping_yes=pl.col("Coping_Struggles").str.strip_chars().str.to_lowercase() == "yes",
+            history_yes=pl.col("Mental_Health_History").str.strip_chars().str.to_lowercase() == "yes",
+            year=pl.col("Timestamp").dt.year().cast(pl.Int16)
+        )
+        .drop("Timestamp")
+        .collect()
+    )